@@ -8,14 +8,18 @@
 
 This application is responsible to submit jobs to LAVA.
 """
+import concurrent.futures
 import enum
 import argparse
+import hashlib
 import logging
 import sys
 import os
+import re
 import time
+import traceback
 import xmlrpc.client
-import urllib
+import urllib.parse
 
 import jinja2
 import yaml
@@ -23,6 +27,15 @@ import yaml
 
 default_template_base_path = "lava-job-definitions"
 
+default_template_cache_path = os.path.join("~", ".cache", "mbl-tools", "jinja")
+
+default_poll_initial_interval = 10
+
+max_render_workers = 8
+
+# Large enough for a whole rendered job to go out in a single write
+dump_buffer_size = 1024 * 1024
+
 valid_device_types = (
     "bcm2837-rpi-3-b-32",
     "bcm2837-rpi-3-b-plus-32",
@@ -32,12 +45,20 @@ valid_device_types = (
     "imx6ul-pico-mbl",
 )
 
+# Hashed copy of valid_device_types for the argparse choices check. The tuple
+# is kept for the ordering of the help text.
+valid_device_type_choices = frozenset(valid_device_types)
+
+key_value_pattern = re.compile(r"([^=]+)=(.+)")
+
 black_list_images = {
-    "mbl-image-production": [
-        "bcm2837-rpi-3-b-32",
-        "bcm2837-rpi-3-b-plus-32",
-        "imx8mmevk-mbl",
-    ]
+    "mbl-image-production": frozenset(
+        (
+            "bcm2837-rpi-3-b-32",
+            "bcm2837-rpi-3-b-plus-32",
+            "imx8mmevk-mbl",
+        )
+    )
 }
 
 
@@ -60,11 +81,23 @@ class JobStatusCode(enum.Enum):
 class LAVATemplates(object):
     """LAVA templates class."""
 
-    def __init__(self, template_path, lava_template_names, dry_run):
-        """Initialise LAVATemplates class."""
+    def __init__(
+        self,
+        template_path,
+        lava_template_names,
+        dry_run,
+        template_cache_path=None,
+    ):
+        """Initialise LAVATemplates class.
+
+        If template_cache_path is set, compiled templates are cached on disk
+        under that directory and reused across invocations.
+        """
         self.template_path = template_path
         self.lava_template_names = lava_template_names
         self.dry_run = dry_run
+        self.template_cache_path = template_cache_path
+        self.template_env = self._create_environment()
 
     def process(
         self,
@@ -81,63 +114,146 @@ class LAVATemplates(object):
         callback_port,
         treasure_database,
     ):
-        """Process templates rendering them with the right values."""
-        lava_jobs = []
-        for template_name in self.lava_template_names:
-            template = self._load_template(template_name)
-            lava_job = template.render(
-                image_url=image_url,
-                build_tag=build_tag,
-                build_url=build_url,
-                mbl_branch=mbl_branch,
-                mbl_revisions=mbl_revisions,
-                pipeline_data=pipeline_data,
-                notify_user=notify_user,
-                notify_emails=notify_emails,
-                device_type=device_type,
-                callback_domain=callback_domain,
-                callback_port=callback_port,
-                treasure_database=treasure_database,
-                tags={},
+        """Process templates rendering them with the right values.
+
+        Return the rendered LAVA jobs or, with dry_run set, the paths of the
+        files they have been dumped into.
+        """
+        context = dict(
+            image_url=image_url,
+            build_tag=build_tag,
+            build_url=build_url,
+            mbl_branch=mbl_branch,
+            mbl_revisions=mbl_revisions,
+            pipeline_data=pipeline_data,
+            notify_user=notify_user,
+            notify_emails=notify_emails,
+            device_type=device_type,
+            callback_domain=callback_domain,
+            callback_port=callback_port,
+            treasure_database=treasure_database,
+            tags={},
+        )
+        # Templates are independent of each other: render them concurrently.
+        # The jinja2 environment is shared, which is safe across threads.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(
+                1, min(max_render_workers, len(self.lava_template_names))
+            )
+        ) as executor:
+            return list(
+                executor.map(
+                    lambda name: self._process_template(name, context),
+                    self.lava_template_names,
+                )
+            )
+
+    def _process_template(self, template_name, context):
+        """Render a single template into a LAVA job.
+
+        Jobs are not submitted in dry-run: they are streamed to disk without
+        being kept in memory and the path of the dumped job is returned.
+        """
+        if self.dry_run:
+            return self._dump_job(
+                self._load_template(template_name).stream(context),
+                context["device_type"],
+                template_name,
             )
-            lava_jobs.append(lava_job)
-            if self.dry_run:
-                self._dump_job(lava_job, device_type, template_name)
-        return lava_jobs
+        return self._render_job(template_name, context)
+
+    def _render_job(self, template_name, context):
+        """Render a LAVA job and check that it is valid yaml.
 
-    def _dump_job(self, job, device_type, template_name):
-        """Dump LAVA job into yaml files under tmp/ directory structure."""
+        Broken jobs are reported before any connection to LAVA is made, so
+        that none of the other jobs get submitted either.
+        """
+        job = self._load_template(template_name).render(context)
+        try:
+            yaml.safe_load(job)
+        except yaml.YAMLError as e:
+            raise Exception(
+                "Invalid LAVA job rendered from template {}: {}".format(
+                    template_name, e
+                )
+            )
+        return job
+
+    def _dump_job(self, job_stream, device_type, template_name):
+        """Dump LAVA job into yaml files under tmp/ directory structure.
+
+        The job is written as it is rendered from the jinja2 template stream.
+        Return the path of the file written.
+        """
         output_path = "tmp"
         testpath = os.path.join(output_path, device_type, template_name)
-        logging.info("Dumping job data into {}".format(testpath))
-        if not os.path.exists(os.path.dirname(testpath)):
-            os.makedirs(os.path.dirname(testpath))
-        with open(testpath, "w") as f:
-            f.write(job)
+        logging.info("Dumping job data into %s", testpath)
+        os.makedirs(os.path.dirname(testpath), exist_ok=True)
+        with open(testpath, "wb", buffering=dump_buffer_size) as f:
+            job_stream.dump(f, encoding="utf-8")
+        return testpath
+
+    def _create_environment(self):
+        """Return the jinja2 environment used to load every template.
+
+        Templates are read-only while jobs are submitted, so they are cached
+        without limit and never checked for changes on disk. Auto-reload is
+        only kept for --dry-run, which is used while editing templates.
+        """
+        template_loader = jinja2.FileSystemLoader(
+            searchpath=[
+                os.path.join(self.template_path, "testplans"),
+                self.template_path,
+            ]
+        )
+        return jinja2.Environment(
+            loader=template_loader,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=self.dry_run,
+            cache_size=-1,
+            bytecode_cache=self._create_bytecode_cache(),
+        )
+
+    def _create_bytecode_cache(self):
+        """Return a jinja2 bytecode cache on disk, if caching is enabled.
+
+        Every template path gets its own cache directory. If the directory
+        cannot be created or written to, the templates are compiled without
+        a cache: jinja2 would otherwise fail to load them when it stores
+        their bytecode.
+        """
+        if not self.template_cache_path:
+            return None
+        try:
+            cache_dir = os.path.join(
+                os.path.expanduser(self.template_cache_path),
+                hashlib.sha256(
+                    os.path.abspath(self.template_path).encode()
+                ).hexdigest(),
+            )
+            os.makedirs(cache_dir, exist_ok=True)
+        except (OSError, ValueError) as e:
+            logging.warning("Template bytecode cache disabled: %s", e)
+            return None
+        if not os.access(cache_dir, os.W_OK):
+            logging.warning(
+                "Template bytecode cache disabled: %s is not writable",
+                cache_dir,
+            )
+            return None
+        return jinja2.FileSystemBytecodeCache(directory=cache_dir)
 
     def _load_template(self, template_name):
         """Return a jinja2 template starting from a yaml file on disk."""
         try:
-            if template_name:
-                template_full_path = os.path.join(
-                    self.template_path, "testplans"
-                )
-                template_loader = jinja2.FileSystemLoader(
-                    searchpath=[template_full_path, self.template_path]
-                )
-                template_env = jinja2.Environment(
-                    loader=template_loader,
-                    trim_blocks=True,
-                    lstrip_blocks=True,
-                )
-                template = template_env.get_template(template_name)
-        except jinja2.exceptions.TemplateNotFound as e:
+            return self.template_env.get_template(template_name)
+        except jinja2.exceptions.TemplateNotFound:
             raise Exception(
                 "Cannot find template {} in {}".format(
-                    template_name, template_full_path
+                    template_name, self.template_path
                 )
             )
-        return template
 
 
 class LAVAServer(object):
@@ -146,37 +262,72 @@ class LAVAServer(object):
     def __init__(self, server_url, username, token, dry_run):
         """Initialise LAVAServer class."""
         self.base_url = self._normalise_url(server_url)
+        self.base_url_parts = urllib.parse.urlsplit(self.base_url)
         self.api_url = self._get_api_url(username, token)
         self.job_info_url = self._get_job_info_url()
-        self.connection = self._connect()
+        self._connection = None
         self.dry_run = dry_run
 
-    def submit_job(self, job):
-        """Submit a job to LAVA.
-
-        This function returns an XML-RPC integer which is the newly created
-        job's id, provided the user is authenticated with an username and
-        token. If the job is a multinode job, this function returns the list of
+    @property
+    def connection(self):
+        """Return the xmlrpc client, connecting to LAVA on first use."""
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    @connection.setter
+    def connection(self, connection):
+        """Set the xmlrpc client used to talk to LAVA."""
+        self._connection = connection
+
+    def submit_jobs(self, jobs):
+        """Submit a list of jobs to LAVA.
+
+        All the jobs are submitted in a single XML-RPC round trip, batching
+        the scheduler.submit_job calls with an xmlrpc MultiCall.
+        For every job, scheduler.submit_job returns an XML-RPC integer which
+        is the newly created job's id, provided the user is authenticated
+        with an username and token. If the job is a multinode job, it returns
+        the list of created job IDs. This function returns the list of all
         created job IDs.
+        If LAVA rejects some of the jobs, the others still run: their IDs are
+        logged before raising an exception naming the rejected jobs.
         """
         job_ids = []
         if self.dry_run:
-            logging.warning("Job not submitted (--dry-run passed)")
-        else:
-            jobs = self.connection.scheduler.submit_job(job)
-            if isinstance(jobs, int):
-                job_ids = [jobs]
+            logging.warning("Jobs not submitted (--dry-run passed)")
+            return job_ids
+        multicall = xmlrpc.client.MultiCall(self.connection)
+        for job in jobs:
+            multicall.scheduler.submit_job(job)
+        results = multicall()
+        rejected = []
+        for index in range(len(jobs)):
+            # Indexing the results raises the Fault of a rejected job
+            try:
+                submitted = results[index]
+            except xmlrpc.client.Fault as fault:
+                rejected.append(
+                    "job {}: {}".format(index + 1, fault.faultString)
+                )
+                continue
+            if isinstance(submitted, int):
+                job_ids.append(submitted)
             else:
-                job_ids = jobs
-            logging.debug("Job(s) submitted: {}".format(job_ids))
+                job_ids.extend(submitted)
+        if rejected:
+            logging.error("Job(s) submitted: %s", job_ids)
+            raise Exception(
+                "LAVA rejected {} of {} job(s): {}".format(
+                    len(rejected), len(jobs), "; ".join(rejected)
+                )
+            )
+        logging.debug("Job(s) submitted: %s", job_ids)
         return job_ids
 
     def get_job_urls(self, job_ids):
         """Given a list of job IDs, return their full urls."""
-        lava_job_urls = []
-        for job_id in job_ids:
-            lava_job_urls.append(self.job_info_url.format(job_id))
-        return lava_job_urls
+        return [self.job_info_url + str(job_id) for job_id in job_ids]
 
     def check_job_status(self, job_id):
         """Given a job ID, return its status (waiting, passed, failed)."""
@@ -193,52 +344,78 @@ class LAVAServer(object):
         return return_value
 
     def _connect(self):
-        """Create a xmlrpc client using LAVA url API."""
+        """Create a xmlrpc client using LAVA url API.
+
+        The client is given a single transport, which keeps its HTTP(S)
+        connection alive and reuses it for every request to the server.
+        Responses are unmarshalled into builtin types and None is allowed.
+        """
         try:
-            connection = xmlrpc.client.ServerProxy(self.api_url)
-            logging.debug("Connected to LAVA: {}".format(connection))
+            connection = xmlrpc.client.ServerProxy(
+                self.api_url, transport=self._get_transport(), allow_none=True
+            )
+            logging.debug("Connected to LAVA: %s", connection)
         except (xmlrpc.client.ProtocolError, xmlrpc.client.Fault) as e:
             raise e
         return connection
 
+    def _get_transport(self):
+        """Return a keep-alive xmlrpc transport for the LAVA url scheme."""
+        if self.base_url_parts.scheme == "https":
+            return xmlrpc.client.SafeTransport(use_builtin_types=True)
+        return xmlrpc.client.Transport(use_builtin_types=True)
+
     def _normalise_url(self, server_url):
         """Return LAVA base url."""
-        if not (
-            server_url.startswith("http://")
-            or server_url.startswith("https://")
-        ):
+        if not server_url.startswith(("http://", "https://")):
             server_url = "https://{}".format(server_url)
-        logging.debug("Base LAVA url: {}".format(server_url))
+        logging.debug("Base LAVA url: %s", server_url)
         return server_url
 
     def _get_api_url(self, username, token):
-        """Return LAVA API url."""
-        url = urllib.parse.urlsplit(self.base_url)
-        api_url = "{}://{}:{}@{}/RPC2".format(
-            url.scheme, username, token, url.netloc
+        """Return LAVA API url.
+
+        Username and token are quoted as they may contain characters such as
+        ":" or "@", which are unquoted again when the client authenticates.
+        """
+        url = self.base_url_parts
+        credentials = "{}:{}".format(
+            urllib.parse.quote(username, safe=""),
+            urllib.parse.quote(token, safe=""),
         )
-        logging.debug("API LAVA url: {}".format(api_url))
+        netloc = "{}@{}".format(credentials, url.netloc)
+        api_url = urllib.parse.urlunsplit(
+            (url.scheme, netloc, "/RPC2", "", "")
+        )
+        logging.debug("API LAVA url: %s", api_url)
         return api_url
 
     def _get_job_info_url(self):
-        """Return LAVA base url for job details."""
-        url = urllib.parse.urlsplit(self.base_url)
-        job_info_url = "{}://{}/scheduler/job/{{}}".format(
-            url.scheme, url.netloc
+        """Return LAVA base url for job details.
+
+        The returned url is a prefix: the job ID is appended to it.
+        """
+        url = self.base_url_parts
+        job_info_url = urllib.parse.urlunsplit(
+            (url.scheme, url.netloc, "/scheduler/job/", "", "")
         )
-        logging.debug("Job info LAVA url: {}".format(job_info_url))
+        logging.debug("Job info LAVA url: %s", job_info_url)
         return job_info_url
 
 
 def key_value_data(string):
-    """Validate the string to be in the form key=value."""
+    """Validate the string to be in the form key=value.
+
+    Return a (key, value) tuple, or None if the string is empty. The value
+    may itself contain "=".
+    """
     if string:
-        key, value = string.split("=")
-        if not (key and value):
+        match = key_value_pattern.fullmatch(string)
+        if not match:
             msg = "{} not in 'key=value' format.".format(string)
             raise argparse.ArgumentTypeError(msg)
-        return {key: value}
-    return {}
+        return match.groups()
+    return None
 
 
 class StoreDictKeyPair(argparse.Action):
@@ -251,14 +428,11 @@ class StoreDictKeyPair(argparse.Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
         """Store data into the namespace."""
-        values_dict = {}
-        for item in values:
-            values_dict.update(item)
-        setattr(namespace, self.dest, values_dict)
+        setattr(namespace, self.dest, dict(item for item in values if item))
 
 
-def _parse_arguments(cli_args):
-    """Parse arguments."""
+def _build_parser():
+    """Build the argument parser."""
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawTextHelpFormatter
     )
@@ -282,9 +456,11 @@ def _parse_arguments(cli_args):
     )
     parser.add_argument(
         "--device-type",
-        help="Device type in LAVA",
+        help="Device type(s) in LAVA",
         dest="device_type",
-        choices=valid_device_types,
+        nargs="+",
+        choices=valid_device_type_choices,
+        metavar="{{{}}}".format(",".join(valid_device_types)),
         required=True,
     )
     parser.add_argument(
@@ -316,7 +492,7 @@ def _parse_arguments(cli_args):
         metavar="key=value",
         type=key_value_data,
         action=StoreDictKeyPair,
-        default="",
+        default={},
     )
     parser.add_argument(
         "--mbl-revisions",
@@ -327,7 +503,7 @@ def _parse_arguments(cli_args):
         metavar="key=value",
         type=key_value_data,
         action=StoreDictKeyPair,
-        default="",
+        default={},
     )
     parser.add_argument("--build-tag", help="Build tag", dest="build_tag")
     parser.add_argument("--build-url", help="Build url", dest="build_url")
@@ -337,6 +513,14 @@ def _parse_arguments(cli_args):
         dest="template_path",
         default=default_template_base_path,
     )
+    parser.add_argument(
+        "--no-template-cache",
+        help="Do not cache compiled LAVA job templates in\n{}".format(
+            default_template_cache_path
+        ),
+        action="store_false",
+        dest="template_cache",
+    )
     parser.add_argument(
         "--notify-user",
         help="Enable email notification to the user",
@@ -392,20 +576,29 @@ def _parse_arguments(cli_args):
     )
     parser.add_argument(
         "--poll-interval",
-        help="Poll interval for the lava queries",
+        help="Maximum poll interval for the lava queries, in seconds",
         type=int,
         dest="poll_interval",
         default=600,
     )
     parser.add_argument(
         "--poll-retries",
-        help="Maximum amount of times the result is polled",
+        help="Maximum amount of poll intervals to wait for the result",
         type=int,
         dest="poll_retries",
         default=5,
     )
 
-    return parser.parse_args(cli_args)
+    return parser
+
+
+# Built once at import, then reused for every parse
+_parser = _build_parser()
+
+
+def _parse_arguments(cli_args):
+    """Parse arguments."""
+    return _parser.parse_args(cli_args)
 
 
 def _set_default_args(args):
@@ -413,12 +606,12 @@ def _set_default_args(args):
     # Set default build tag name based on lava username
     default_build_tag = "{} build".format(args.lava_username)
     args.build_tag = args.build_tag if args.build_tag else default_build_tag
-    logging.debug("Using build_tag: {}".format(args.build_tag))
+    logging.debug("Using build_tag: %s", args.build_tag)
 
     # Set null build_url if it doesn't exist
     default_build_url = "-"
     args.build_url = args.build_url if args.build_url else default_build_url
-    logging.debug("Using build_url: {}".format(args.build_url))
+    logging.debug("Using build_url: %s", args.build_url)
 
     # Set notify_user to the same user who has submitted the job
     if args.notify_user:
@@ -438,11 +631,18 @@ def _enable_debug_logging(debug=False):
 
 
 def poll_result(poll_retries, poll_interval, job_ids, lava_server):
-    """Poll result of the given job ids."""
-    i = 0
+    """Poll result of the given job ids.
+
+    The results are checked straight away and then with an exponential
+    backoff, starting from default_poll_initial_interval seconds and capped
+    at poll_interval. Polling gives up after poll_retries * poll_interval
+    seconds of waiting.
+    """
+    max_wait = poll_retries * poll_interval
+    waited = 0
+    delay = min(default_poll_initial_interval, poll_interval)
     error_occurred = False
-    while i < poll_retries:
-        time.sleep(poll_interval)
+    while True:
         logging.debug("Polling for test results")
         for job_id in job_ids:
             status = lava_server.check_job_status(job_id)
@@ -459,7 +659,11 @@ def poll_result(poll_retries, poll_interval, job_ids, lava_server):
         elif len(job_ids) == 0 and error_occurred is True:
             logging.debug("Finished polling jobs, failures detected")
             return ExitCode.SUCCESS.value
-        i += 1
+        if waited >= max_wait:
+            break
+        time.sleep(delay)
+        waited += delay
+        delay = min(delay * 2, poll_interval)
     logging.debug("Finished polling jobs, max retries reached")
     return ExitCode.ERROR.value
 
@@ -478,49 +682,59 @@ def _main(args):
 
         # Check for black listing
         for image, devices in black_list_images.items():
-            if image in args.image_url and args.device_type in devices:
-                logging.error(
-                    "Job black listed ({} not supported on {})".format(
-                        image, args.device_type
+            for device_type in args.device_type:
+                if image in args.image_url and device_type in devices:
+                    logging.error(
+                        "Job black listed (%s not supported on %s)",
+                        image,
+                        device_type,
                     )
-                )
-                return ExitCode.ERROR.value
+                    return ExitCode.ERROR.value
 
-        # Load LAVA templates
+        # Load LAVA templates once for all the device types
         lava_template = LAVATemplates(
-            args.template_path, args.template_names, args.dry_run
+            args.template_path,
+            args.template_names,
+            args.dry_run,
+            default_template_cache_path if args.template_cache else None,
         )
 
-        # Create LAVA jobs yaml file from templates
-        lava_jobs = lava_template.process(
-            args.image_url,
-            args.build_tag,
-            args.build_url,
-            args.mbl_branch,
-            args.mbl_revisions,
-            args.pipeline_data,
-            args.notify_user,
-            args.notify_emails,
-            args.device_type,
-            args.callback_domain,
-            args.callback_port,
-            args.treasure_database,
-        )
+        # Create LAVA jobs yaml file from templates for every device type
+        lava_jobs = []
+        for device_type in args.device_type:
+            lava_jobs.extend(
+                lava_template.process(
+                    args.image_url,
+                    args.build_tag,
+                    args.build_url,
+                    args.mbl_branch,
+                    args.mbl_revisions,
+                    args.pipeline_data,
+                    args.notify_user,
+                    args.notify_emails,
+                    device_type,
+                    args.callback_domain,
+                    args.callback_port,
+                    args.treasure_database,
+                )
+            )
+
+        # Nothing else to do: the jobs have been dumped to disk
+        if args.dry_run:
+            logging.warning("Jobs not submitted (--dry-run passed)")
+            return ExitCode.SUCCESS.value
 
         # Instantiate a LAVA server
         lava_server = LAVAServer(
             args.lava_server, args.lava_username, args.lava_token, args.dry_run
         )
 
-        job_ids = []
-        for lava_job in lava_jobs:
-            # Submit the job to LAVA
-            submitted_job_ids = lava_server.submit_job(lava_job)
-            # Get the IDs and print the job info urls
-            job_id_urls = lava_server.get_job_urls(submitted_job_ids)
-            for job_id_url in job_id_urls:
-                logging.info("Job submitted: {}".format(job_id_url))
-            job_ids.extend(submitted_job_ids)
+        # Submit all the jobs to LAVA in a single request
+        job_ids = lava_server.submit_jobs(lava_jobs)
+
+        # Print the job info urls
+        for job_id_url in lava_server.get_job_urls(job_ids):
+            logging.info("Job submitted: %s", job_id_url)
 
         if args.poll_result:
             return poll_result(
@@ -532,9 +746,8 @@ def _main(args):
         return ExitCode.CTRLC.value
     except Exception as e:
         logging.error(e)
-        if args.debug:
-            import traceback
-
+        # args is still the raw command line list if parsing failed
+        if getattr(args, "debug", False):
             traceback.print_exc()
         return ExitCode.ERROR.value
     return ExitCode.SUCCESS.value
@@ -0,0 +1,22 @@
+# Copyright (c) 2019, Arm Limited and Contributors. All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Pytest configuration.
+
+submit-to-lava.py is not a valid module name, so it cannot be imported
+directly by the tests. It is loaded once here and registered as the
+submit_to_lava module, which the tests then import as usual.
+"""
+
+import importlib.util
+import pathlib
+import sys
+
+_spec = importlib.util.spec_from_file_location(
+    "submit_to_lava",
+    str(pathlib.Path(__file__).parent.parent / "submit-to-lava.py"),
+)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules["submit_to_lava"] = _module
+_spec.loader.exec_module(_module)
@@ -9,20 +9,48 @@
 
 """Parsed source code checkers for licensing violations."""
 
+import copy
+import hashlib
+import itertools
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from . import violations
 from .config import IllegalConfiguration
-from .parser import Parser, StringIO
-from .utils import log
+from .parser import Parser
+from .utils import is_blank, log
 
 
 BB_FILE_EXTENSIONS = (".bb", ".bbappend", ".bbclass", ".conf", ".inc")
 
+# Copyright and licence notices are in the header of a file: only this many
+# bytes at the start of each file are read and checked.
+HEADER_SIZE = 16 * 1024
+
+# Number of file headers read ahead of the one being checked, and of threads
+# reading them.
+READ_AHEAD = 16
+READ_AHEAD_WORKERS = 8
+
+
+def check_for(code, is_check=True, tpip_only=False):
+    """Add attributes to recognize error checking methods and their code.
 
-def check_for(is_check=True):
-    """Add an attribute to recognize error checking methods."""
+    `tpip_only` checks can only report an error for files containing TPIP.
+    """
     # wrapper
     def decorator(func):
         func._check_for = is_check
+        func._code = code
+        func._tpip_only = tpip_only
+        # Build the explanation once, it is shared by every error the check
+        # reports.
+        _, _, explanation = func.__doc__.partition(".\n")
+        func._explanation = "\n".join(
+            line for line in explanation.split("\n") if not is_blank(line)
+        )
         return func
 
     return decorator
@@ -37,32 +65,30 @@ class ConventionChecker:
     D40x: Licence content issues
     """
 
-    def check_source(self, source, filename):
-        """Check various possible errors in a source file."""
-        parser = Parser(StringIO(source))
-        parser.parse_filelike()
+    def check_source(self, source, filename, checked_codes=None):
+        """Check various possible errors in a source file.
+
+        If `checked_codes` is given, only the checks for those error codes are
+        run.
+        """
+        parser = Parser(source)
+        parser.parse_source()
         for this_check in self.checks:
+            if checked_codes is not None and (
+                this_check._code not in checked_codes
+            ):
+                continue
+            if this_check._tpip_only and not parser.is_tpip:
+                continue
+            # Each check reports at most one error
             error = this_check(self, parser, filename)
-            errors = error if hasattr(error, "__iter__") else [error]
-            for error in errors:
-                if error is not None:
-                    partition = this_check.__doc__.partition(".\n")
-                    message, _, explanation = partition
-                    error.set_context(
-                        filename=filename, explanation=explanation
-                    )
-                    yield error
-
-    @property
-    def checks(self):
-        """Return a collection of method that check for errors."""
-        return [
-            this_check
-            for this_check in vars(type(self)).values()
-            if hasattr(this_check, "_check_for")
-        ]
-
-    @check_for()
+            if error is not None:
+                error.set_context(
+                    filename=filename, explanation=this_check._explanation
+                )
+                yield error
+
+    @check_for("D100")
     def check_arm_copyright_missing(self, parser, filename):
         """D100: Missing ARM copyright notice.
 
@@ -81,7 +107,7 @@ class ConventionChecker:
                 return
         return violations.D100()
 
-    @check_for()
+    @check_for("D101", tpip_only=True)
     def check_tpip_path_missing(self, parser, filename):
         """D101: Missing the fully qualified path and filename.
 
@@ -97,7 +123,7 @@ class ConventionChecker:
             if not parser.tpip_path:
                 return violations.D101()
 
-    @check_for()
+    @check_for("D102", tpip_only=True)
     def check_tpip_uri_missing(self, parser, filename):
         """D102: Missing the URI to the source code repository.
 
@@ -113,7 +139,7 @@ class ConventionChecker:
             if not parser.tpip_source_uri:
                 return violations.D102()
 
-    @check_for()
+    @check_for("D103", tpip_only=True)
     def check_tpip_copyright_missing(self, parser, filename):
         """D103: Missing a copy of the original copyright notice.
 
@@ -129,7 +155,7 @@ class ConventionChecker:
             if not parser.tpip_copyright:
                 return violations.D103()
 
-    @check_for()
+    @check_for("D200")
     def check_spdx_id_missing(self, parser, filename):
         """D200: Missing the SPDX license Identifier.
 
@@ -138,64 +164,58 @@ class ConventionChecker:
         if not parser.spdx_identifier:
             return violations.D200()
 
-    @check_for()
+    @check_for("D300")
     def check_spdx_id_not_apache_2_0(self, parser, filename):
         """D300: The SPDX license identifier should be Apache-2.0.
 
         `Apache-2.0` was the expected SPDX identifier.
         """
-        if (
-            parser.tpip_path
-            or parser.tpip_source_uri
-            or parser.tpip_copyright
-            or parser.arm_copyright_tpip
-        ):
+        if parser.is_tpip or filename.endswith(BB_FILE_EXTENSIONS):
             return
         if parser.spdx_identifier != "Apache-2.0":
-            for file_extension in BB_FILE_EXTENSIONS:
-                if filename.endswith(file_extension):
-                    return
             return violations.D300(parser.spdx_identifier)
 
-    @check_for()
+    @check_for("D301")
     def check_spdx_id_not_bsd(self, parser, filename):
         """D301: The SPDX license identifier should be BSD-3-Clause.
 
         `BSD-3-Clause` was the expected SPDX identifier.
         """
-        if (
-            parser.tpip_path
-            or parser.tpip_source_uri
-            or parser.tpip_copyright
-            or parser.arm_copyright_tpip
-        ):
+        if parser.is_tpip or filename.endswith(BB_FILE_EXTENSIONS):
             return
         if parser.spdx_identifier != "BSD-3-Clause":
-            for file_extension in BB_FILE_EXTENSIONS:
-                if filename.endswith(file_extension):
-                    return
             return violations.D301(parser.spdx_identifier)
 
-    @check_for()
+    @check_for("D302")
     def check_spdx_id_not_mit(self, parser, filename):
         """D302: The SPDX license identifier should be MIT.
 
         `MIT` was the expected SPDX identifier.
         """
-        if (
-            parser.tpip_path
-            or parser.tpip_source_uri
-            or parser.tpip_copyright
-            or parser.arm_copyright_tpip
-        ):
+        if parser.is_tpip or not filename.endswith(BB_FILE_EXTENSIONS):
             return
         if parser.spdx_identifier != "MIT":
-            for file_extension in BB_FILE_EXTENSIONS:
-                if filename.endswith(file_extension):
-                    return violations.D302(parser.spdx_identifier)
+            return violations.D302(parser.spdx_identifier)
+
+    # The methods that check for errors, collected once when the class is
+    # created rather than every time a file is checked.
+    checks = tuple(
+        this_check
+        for this_check in list(vars().values())
+        if hasattr(this_check, "_check_for")
+    )
+
+
+# The checker holds no state, the same instance checks every file
+_checker = ConventionChecker()
+
+# Thread pool reading file headers ahead, shared by every `read_headers` call
+# of a process, and the id of the process that created it
+_read_ahead_executor = None
+_read_ahead_pid = None
 
 
-def check(filenames, select=None, ignore=None):
+def check(filenames, select=None, ignore=None, header_size=HEADER_SIZE):
     """Generate licensing errors that exists in `filenames` iterable.
 
     By default, the REUSE 2.0 convention is checked. To specifically define the
@@ -213,6 +233,10 @@ def check(filenames, select=None, ignore=None):
     `mbl_licensing_checker.violations.conventions.reuse_v2_0` as a base set to
     add or remove errors from.
 
+    Only the first `header_size` bytes of each file are checked. Files that
+    cannot be read are logged as warnings and skipped. Files with identical
+    headers are only checked once and their errors reported for each of them.
+
     Examples
     --------
     >>> check(["foo.py"])
@@ -231,23 +255,110 @@ def check(filenames, select=None, ignore=None):
             "They are mutually exclusive."
         )
     elif select is not None:
-        checked_codes = select
+        checked_codes = frozenset(select)
     elif ignore is not None:
-        checked_codes = list(
-            set(violations.ErrorRegistry.get_error_codes()) - set(ignore)
-        )
+        checked_codes = violations.all_errors - frozenset(ignore)
     else:
         checked_codes = violations.conventions.reuse_v2_0
 
-    for filename in filenames:
-        log.info("Checking file {}.".format(filename))
+    # Errors found in each distinct file header, keyed by `get_header_key`
+    checked_headers = {}
+
+    files_to_check = ((filename, checked_codes) for filename in filenames)
+    for filename, _, digest, source in read_headers(
+        files_to_check, header_size
+    ):
+        key = get_header_key(filename, checked_codes, digest)
+        if key in checked_headers:
+            yield from copy_errors(checked_headers[key], filename)
+            continue
+        errors = check_source(source, filename, checked_codes)
+        checked_headers[key] = errors
+        yield from errors
+
+
+def read_headers(files_to_check, header_size=HEADER_SIZE):
+    """Generate the header of each file that can be read.
+
+    `files_to_check` is an iterable of (filename, checked_codes) tuples, as
+    generated by `ConfigurationParser.get_files_to_check`. Yield
+    (filename, checked_codes, digest, source) tuples where `source` is the
+    decoded first `header_size` bytes of the file and `digest` their digest.
+    Files that cannot be read are logged as warnings and skipped.
+    """
+    # Read the next file headers in the background while a file is checked
+    executor = _get_read_ahead_executor()
+    files_to_check = iter(files_to_check)
+    pending = deque(
+        (
+            filename,
+            checked_codes,
+            executor.submit(_read_header, filename, header_size),
+        )
+        for filename, checked_codes in itertools.islice(
+            files_to_check, READ_AHEAD
+        )
+    )
+    while pending:
+        filename, checked_codes, header = pending.popleft()
+        for next_filename, next_codes in itertools.islice(files_to_check, 1):
+            future = executor.submit(_read_header, next_filename, header_size)
+            pending.append((next_filename, next_codes, future))
+        if log.isEnabledFor(logging.INFO):
+            log.info("Checking file %s.", filename)
         try:
-            with open(filename) as file:
-                source = file.read()
-            for error in ConventionChecker().check_source(source, filename):
-                code = getattr(error, "code", None)
-                if code in checked_codes:
-                    yield error
-        except EnvironmentError as error:
-            log.warning("Error in file {}: {}".format(filename, error))
-            yield error
+            digest, source = header.result()
+        except OSError as error:
+            log.warning("Error in file %s: %s", filename, error)
+            continue
+        yield filename, checked_codes, digest, source
+
+
+def get_header_key(filename, checked_codes, digest):
+    """Return a key identifying the files which have the same errors.
+
+    Apart from its header, only the extension of a file and the error codes
+    it is checked for change the errors found in it.
+    """
+    return digest, filename.endswith(BB_FILE_EXTENSIONS), checked_codes
+
+
+def check_source(source, filename, checked_codes=None):
+    """Return the list of licensing errors found in a file header."""
+    return list(_checker.check_source(source, filename, checked_codes))
+
+
+def copy_errors(errors, filename):
+    """Return copies of the errors found in another file for `filename`."""
+    copies = []
+    for error in errors:
+        error = copy.copy(error)
+        error.set_context(filename=filename, explanation=error.explanation)
+        copies.append(error)
+    return copies
+
+
+def _get_read_ahead_executor():
+    """Return the thread pool reading file headers ahead.
+
+    The pool is created on first use in each process: a forked process does
+    not inherit the threads of its parent, so it creates its own pool.
+    """
+    global _read_ahead_executor, _read_ahead_pid
+    if _read_ahead_pid != os.getpid():
+        _read_ahead_executor = ThreadPoolExecutor(
+            max_workers=READ_AHEAD_WORKERS
+        )
+        _read_ahead_pid = os.getpid()
+    return _read_ahead_executor
+
+
+def _read_header(filename, header_size):
+    """Return the digest and the decoded first `header_size` bytes."""
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        header = os.read(fd, header_size)
+    finally:
+        os.close(fd)
+    digest = hashlib.blake2b(header, digest_size=16).digest()
+    return digest, header.decode("utf-8", "replace")
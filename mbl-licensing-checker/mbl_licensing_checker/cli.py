@@ -8,13 +8,22 @@
 # SPDX-License-Identifier: MIT
 """Command line interface for mbl-licensing-checker."""
 import logging
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 
 from .utils import log
 from .violations import Error
 from .config import ConfigurationParser, IllegalConfiguration
-from .checker import check
+from .checker import (
+    HEADER_SIZE,
+    check_source,
+    copy_errors,
+    get_header_key,
+    read_headers,
+)
 
 
 class ReturnCode(Enum):
@@ -27,9 +36,9 @@ class ReturnCode(Enum):
 
 def run_mbl_licensing_checker():
     """Application main algorithm."""
-    log.setLevel(logging.DEBUG)
     conf = ConfigurationParser()
-    _setup_stream_handlers(conf.get_default_run_configuration())
+    default_run_conf = conf.get_default_run_configuration()
+    _setup_stream_handlers(default_run_conf)
 
     try:
         conf.parse()
@@ -38,27 +47,38 @@ def run_mbl_licensing_checker():
 
     run_conf = conf.get_user_run_configuration()
 
-    # Reset the logger according to the command line arguments
-    _setup_stream_handlers(run_conf)
+    # Reset the logger if the command line arguments changed its verbosity
+    if (run_conf.debug, run_conf.verbose) != (
+        default_run_conf.debug,
+        default_run_conf.verbose,
+    ):
+        _setup_stream_handlers(run_conf)
 
     log.debug("starting in debug mode.")
 
     Error.explain = run_conf.explain
 
-    errors = []
-
+    # File headers are checked independently of each other: spread them over
+    # several processes while the next files are found. The errors are still
+    # reported in the files order, as soon as each file has been checked.
+    count = 0
+    jobs = run_conf.jobs or os.cpu_count() or 1
+    header_size = run_conf.header_size or HEADER_SIZE
     try:
-        for filename, checked_codes in conf.get_files_to_check():
-            errors.extend(check((filename,), select=checked_codes))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for errors in _check_files(
+                executor,
+                conf.get_files_to_check(),
+                header_size,
+                max_pending=2 * jobs,
+            ):
+                sys.stdout.write(
+                    "".join("{}\n".format(error) for error in errors)
+                )
+                count += len(errors)
     except IllegalConfiguration as error:
         log.error(error.args[0])
         return ReturnCode.INVALID_OPTIONS.value
-
-    count = 0
-    for error in errors:  # type: ignore
-        if hasattr(error, "code"):
-            sys.stdout.write("{}\n".format(error))
-        count += 1
     if count == 0:
         exit_code = ReturnCode.NO_VIOLATIONS_FOUND.value
     else:
@@ -68,6 +88,76 @@ def run_mbl_licensing_checker():
     return exit_code
 
 
+def _check_files(
+    executor, files_to_check, header_size, max_pending, batch_size=32
+):
+    """Generate the list of errors found in each file, in order.
+
+    The file headers are read here and only the distinct ones are sent to
+    `executor`, in batches of at most `batch_size` headers: the errors found
+    in a header are reported for every file that has it. At most
+    `max_pending` batches of files are checked ahead of the file whose errors
+    are reported, so that `files_to_check` is consumed as the files are
+    checked.
+    """
+    # Errors found in each distinct header, keyed by `get_header_key`
+    checked = {}
+    # Future and index in its batch of each header being checked
+    checking = {}
+    # Headers to check in the next batch, and their keys
+    batch = []
+    batch_keys = []
+    # Files whose errors have not been reported yet, and their header key
+    pending = deque()
+
+    def submit_batch():
+        future = executor.submit(_check_batch, list(batch))
+        for index, key in enumerate(batch_keys):
+            checking[key] = (future, index)
+        batch.clear()
+        batch_keys.clear()
+
+    def get_errors(filename, key):
+        if key in checked:
+            return copy_errors(checked[key], filename)
+        # The first file with this header: it was checked under its name
+        if key not in checking:
+            submit_batch()
+        future, index = checking.pop(key)
+        errors = checked[key] = future.result()[index]
+        return errors
+
+    for filename, checked_codes, digest, source in read_headers(
+        files_to_check, header_size
+    ):
+        key = get_header_key(filename, checked_codes, digest)
+        if (
+            key not in checked
+            and key not in checking
+            and key not in batch_keys
+        ):
+            batch.append((source, filename, checked_codes))
+            batch_keys.append(key)
+            if len(batch) == batch_size:
+                submit_batch()
+        pending.append((filename, key))
+        while len(pending) > max_pending * batch_size:
+            yield get_errors(*pending.popleft())
+    while pending:
+        yield get_errors(*pending.popleft())
+
+
+def _check_batch(batch):
+    """Return the list of errors found in each header of a batch.
+
+    `batch` is a list of (source, filename, checked_codes) tuples.
+    """
+    return [
+        check_source(source, filename, checked_codes)
+        for source, filename, checked_codes in batch
+    ]
+
+
 def main():
     """Run mbl-licensing-checker."""
     try:
@@ -94,6 +184,9 @@ def _setup_stream_handlers(conf):
     else:
         stdout_handler.setLevel(logging.WARNING)
     log.addHandler(stdout_handler)
+    # Let the logger discard the messages no handler would print, so that
+    # they are not formatted at all
+    log.setLevel(stdout_handler.level)
 
     stderr_handler = logging.StreamHandler(sys.stderr)
     msg_format = "%(levelname)s: %(message)s"
@@ -9,8 +9,9 @@
 """Configuration file parsing and utilities."""
 
 import argparse
-import copy
+import bisect
 import functools
+import itertools
 import os
 import re
 from collections import namedtuple
@@ -18,7 +19,7 @@ from collections.abc import Set
 from configparser import RawConfigParser
 
 from .utils import __version__, log
-from .violations import ErrorRegistry, conventions
+from .violations import all_errors, conventions
 
 
 def check_initialized(method):
@@ -78,10 +79,21 @@ class ConfigurationParser:
         "match",
         "match-dir",
     )
+    # Names of the configuration file arguments as argparse stores them
+    CONFIG_FILE_ARGUMENTS_DESTS = frozenset(
+        name.replace("-", "_") for name in CONFIG_FILE_ARGUMENTS
+    )
     DEFAULT_MATCH_RE = r".*\.(bash|bb|bbappend|bbclass|c|cpp|h|hpp|inc|py|sh)$"
+    # The extensions of the files matched by `DEFAULT_MATCH_RE`
+    DEFAULT_MATCH_EXTENSIONS = frozenset(
+        "bash bb bbappend bbclass c cpp h hpp inc py sh".split()
+    )
     DEFAULT_MATCH_DIR_RE = r"[^\.].*"
     DEFAULT_CONVENTION = conventions.reuse_v2_0
 
+    # Sorted, so that the codes starting with a prefix are next to each other
+    ERROR_CODES = tuple(sorted(all_errors))
+
     PROJECT_CONFIG_FILE = ".mbl-licensing-checker"
 
     SECTION_NAME = "mbl-licensing-checker"
@@ -89,9 +101,15 @@ class ConfigurationParser:
     def __init__(self):
         """Create a configuration parser."""
         self._cache = {}
+        self._matches_cache = {}
         self._override_by_cli = None
         self._arguments = self._run_conf = None
+        self._default_arguments = None
         self._parser = self._create_argument_parser()
+        # Type of each argument, to read them from configuration files
+        self._argument_types = {
+            arg.dest: arg.type for arg in self._parser._get_optional_actions()
+        }
 
     # ---------------------------- Public Methods -----------------------------
 
@@ -113,6 +131,12 @@ class ConfigurationParser:
         if not self._validate_convention(self._arguments):
             raise IllegalConfiguration()
 
+        if not self._validate_jobs(self._arguments):
+            raise IllegalConfiguration()
+
+        if not self._validate_header_size(self._arguments):
+            raise IllegalConfiguration()
+
         self._run_conf = self._create_run_config(self._arguments)
 
         config = self._create_check_config(self._arguments, use_defaults=False)
@@ -130,41 +154,81 @@ class ConfigurationParser:
         Walk dir trees under `self._arguments.pathnames` and yield file names
         that `match` under each directory that `match_dir`.
         The method locates the configuration for each file name and yields a
-        tuple of (filename, [error_codes]).
+        tuple of (filename, frozenset(error_codes)).
 
         With every discovery of a new configuration file `IllegalConfiguration`
         might be raised.
         """
         for name in self._arguments.pathnames:
             if os.path.isdir(name):
-                for dirpath, dirnames, filenames in os.walk(name):
-                    config = self._get_config(os.path.abspath(dirpath))
-                    match, match_dir = self._get_matches(config)
-
-                    # Skip any subdirectories that do not match match_dir
-                    dirnames[:] = [d for d in dirnames if match_dir(d)]
-
-                    for filename in filenames:
-                        if match(filename):
-                            full_path = os.path.join(dirpath, filename)
-                            yield (full_path, list(config.checked_codes))
+                yield from self._get_files_in_dir(name)
             else:
                 config = self._get_config(os.path.abspath(name))
                 match, _ = self._get_matches(config)
                 if match(name):
-                    yield (name, list(config.checked_codes))
+                    yield name, config.checked_codes
 
     # --------------------------- Private Methods -----------------------------
 
+    def _get_files_in_dir(self, top):
+        """Generate files and error codes to check in the `top` dir tree.
+
+        The tree is walked top-down, in the same order as `os.walk`, but the
+        type of each entry is taken from `os.scandir` without any further
+        `stat` call. Symbolic links to directories are not followed.
+        The absolute path of each directory is joined from its parent's one,
+        only `top` is made absolute.
+        """
+        dirpaths = [(top, os.path.abspath(top))]
+        while dirpaths:
+            dirpath, abs_dirpath = dirpaths.pop()
+            try:
+                with os.scandir(dirpath) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+
+            config = self._get_config(abs_dirpath)
+            match, match_dir = self._get_matches(config)
+            checked_codes = config.checked_codes
+
+            subdirpaths = []
+            for entry in entries:
+                if _is_dir(entry):
+                    # Skip any subdirectories that do not match match_dir
+                    if match_dir(entry.name) and not entry.is_symlink():
+                        subdirpaths.append(
+                            (
+                                entry.path,
+                                os.path.join(abs_dirpath, entry.name),
+                            )
+                        )
+                elif match(entry.name):
+                    yield entry.path, checked_codes
+            # Walk the subdirectories in the order they were listed
+            dirpaths.extend(reversed(subdirpaths))
+
     def _get_matches(self, conf):
-        """Return the `match` and `match_dir` functions for `config`."""
+        """Return the `match` and `match_dir` functions for `config`.
+
+        The functions are cached for each pair of regular expressions, as
+        most directories share the same configuration.
+        """
+        key = (conf.match, conf.match_dir)
+        if key in self._matches_cache:
+            return self._matches_cache[key]
         try:
-            match_func = re.compile(conf.match + "$").match
-            match_dir_func = re.compile(conf.match_dir + "$").match
-            return match_func, match_dir_func
+            match_func = re.compile(conf.match).fullmatch
+            match_dir_func = re.compile(conf.match_dir).fullmatch
         except re.error:
             error_msg = "Incorrect regular expression specified."
             raise IllegalConfiguration(error_msg)
+        if conf.match == self.DEFAULT_MATCH_RE:
+            match_func = _match_extensions(
+                match_func, self.DEFAULT_MATCH_EXTENSIONS
+            )
+        self._matches_cache[key] = match_func, match_dir_func
+        return match_func, match_dir_func
 
     def _get_config_by_discovery(self, node):
         """Get a configuration for checking `node` by config discovery.
@@ -267,10 +331,11 @@ class ConfigurationParser:
             conf_val = getattr(config, attr)
             final_config[attr] = cli_val if cli_val is not None else conf_val
 
+        final_config["checked_codes"] = self._set_add_arguments(
+            final_config["checked_codes"], self._arguments
+        )
         config = CheckConfiguration(**final_config)
 
-        self._set_add_arguments(config.checked_codes, self._arguments)
-
         # Handle caching
         if self._run_conf.config is not None:
             self._cache[None] = config
@@ -300,11 +365,10 @@ class ConfigurationParser:
         if parser.read(path) and parser.has_section(
             ConfigurationParser.SECTION_NAME
         ):
-            all_arguments = self._parser._get_optional_actions()
-
-            argument_list = {arg.dest: arg.type for arg in all_arguments}
-            # First, read the default values
-            new_arguments = self._parse_args([])
+            # First, copy the default values, only parsed once
+            if self._default_arguments is None:
+                self._default_arguments = self._parse_args([])
+            new_arguments = argparse.Namespace(**vars(self._default_arguments))
 
             # Second, parse the configuration
             section_name = ConfigurationParser.SECTION_NAME
@@ -313,12 +377,12 @@ class ConfigurationParser:
                     should_inherit = parser.getboolean(section_name, arg)
                     continue
 
-                if arg.replace("_", "-") not in self.CONFIG_FILE_ARGUMENTS:
+                normalized_arg = arg.replace("-", "_")
+                if normalized_arg not in self.CONFIG_FILE_ARGUMENTS_DESTS:
                     log.warning("Unknown option '{}' ignored".format(arg))
                     continue
 
-                normalized_arg = arg.replace("-", "_")
-                arg_type = argument_list[normalized_arg]
+                arg_type = self._argument_types[normalized_arg]
                 if arg_type is int:
                     value = parser.getint(section_name, arg)
                 elif arg_type == str:
@@ -345,12 +409,11 @@ class ConfigurationParser:
         add-ignore error codes.
 
         """
-        # Copy the parent error codes so we won't override them
-        error_codes = copy.deepcopy(parent_config.checked_codes)
+        error_codes = parent_config.checked_codes
         if child_arguments.convention is not None:
             error_codes = self._get_convention_error_codes(child_arguments)
 
-        self._set_add_arguments(error_codes, child_arguments)
+        error_codes = self._set_add_arguments(error_codes, child_arguments)
 
         kwargs = dict(checked_codes=error_codes)
         for key in ("match", "match_dir"):
@@ -412,49 +475,65 @@ class ConfigurationParser:
 
     @classmethod
     def _get_convention_error_codes(cls, arguments):
-        """Extract the error codes from the selected convention."""
-        codes = set(ErrorRegistry.get_error_codes())
-        checked_codes = None
+        """Extract the error codes from the selected convention.
 
-        if arguments.convention is not None:
-            checked_codes = getattr(conventions, arguments.convention)
-
-        # To not override the conventions nor the arguments - copy them.
-        return copy.deepcopy(checked_codes)
+        Return them as a frozenset, or None if no convention was selected.
+        """
+        if arguments.convention is None:
+            return None
+        return frozenset(getattr(conventions, arguments.convention))
 
     @classmethod
     def _set_add_arguments(cls, checked_codes, arguments):
-        """Set `checked_codes` by the `add_ignore` or `add_select` options."""
-        checked_codes |= cls._expand_error_codes(arguments.add_select)
-        checked_codes -= cls._expand_error_codes(arguments.add_ignore)
+        """Return `checked_codes` with the `add_select` and `add_ignore` codes.
 
-    @staticmethod
-    def _expand_error_codes(code_parts):
-        """Return an expanded set of error codes."""
-        codes = set(ErrorRegistry.get_error_codes())
-        expanded_codes = set()
+        A new frozenset is returned, `checked_codes` is left unchanged.
+        """
+        add_select = cls._expand_error_codes(arguments.add_select)
+        add_ignore = cls._expand_error_codes(arguments.add_ignore)
+        return (frozenset(checked_codes) | add_select) - add_ignore
 
+    @classmethod
+    def _expand_error_codes(cls, code_parts):
+        """Return an expanded frozenset of error codes."""
         try:
-            for part in code_parts:
-                # Dealing with split-lined configurations; The part might begin
-                # with a whitespace due to the newline character.
-                part = part.strip()
-                if not part:
-                    continue
-
-                codes_to_add = {
-                    code for code in codes if code.startswith(part)
-                }
-                if not codes_to_add:
-                    log.warning(
-                        "Error code passed is not a prefix of any "
-                        "known errors: {}".format(part)
-                    )
-                expanded_codes.update(codes_to_add)
+            code_parts = frozenset(code_parts)
         except TypeError as e:
             raise IllegalConfiguration(e)
+        return cls._expand_frozen_error_codes(code_parts)
 
-        return expanded_codes
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _expand_frozen_error_codes(cls, code_parts):
+        """Return an expanded frozenset of error codes from a frozenset.
+
+        The same code parts are expanded for every configuration, so the
+        expanded codes are cached.
+        """
+        expanded_codes = set()
+
+        for part in code_parts:
+            # Dealing with split-lined configurations; The part might begin
+            # with a whitespace due to the newline character.
+            part = part.strip()
+            if not part:
+                continue
+
+            start = bisect.bisect_left(cls.ERROR_CODES, part)
+            codes_to_add = set(
+                itertools.takewhile(
+                    lambda code: code.startswith(part),
+                    cls.ERROR_CODES[start:],
+                )
+            )
+            if not codes_to_add:
+                log.warning(
+                    "Error code passed is not a prefix of any "
+                    "known errors: {}".format(part)
+                )
+            expanded_codes.update(codes_to_add)
+
+        return frozenset(expanded_codes)
 
     @classmethod
     def _get_checked_errors(cls, arguments):
@@ -463,9 +542,7 @@ class ConfigurationParser:
         if checked_codes is None:
             checked_codes = cls.DEFAULT_CONVENTION
 
-        cls._set_add_arguments(checked_codes, arguments)
-
-        return checked_codes
+        return cls._set_add_arguments(checked_codes, arguments)
 
     @classmethod
     def _validate_convention(cls, arguments):
@@ -485,6 +562,38 @@ class ConfigurationParser:
             return False
         return True
 
+    @staticmethod
+    def _validate_jobs(arguments):
+        """Validate the jobs argument if any was passed.
+
+        Return `True` if a positive number of jobs was passed or if none was
+        passed.
+        """
+        if arguments.jobs is not None and arguments.jobs < 1:
+            log.error(
+                "Illegal number of jobs '{}'. It must be at least 1.".format(
+                    arguments.jobs
+                )
+            )
+            return False
+        return True
+
+    @staticmethod
+    def _validate_header_size(arguments):
+        """Validate the header size argument if any was passed.
+
+        Return `True` if a positive header size was passed or if none was
+        passed.
+        """
+        if arguments.header_size is not None and arguments.header_size < 1:
+            log.error(
+                "Illegal header size '{}'. It must be at least 1.".format(
+                    arguments.header_size
+                )
+            )
+            return False
+        return True
+
     @classmethod
     def _fix_set_arguments(cls, arguments):
         """Alter the set arguments from None/strings to sets in place."""
@@ -574,6 +683,23 @@ class ConfigurationParser:
             help="Search and use configuration starting from this directory",
             default=None,
         )
+        run_config_argument(
+            "-j",
+            "--jobs",
+            metavar="<n>",
+            type=int,
+            default=None,
+            help="Number of processes used to check files; default is the "
+            "number of CPUs",
+        )
+        run_config_argument(
+            "--header-size",
+            metavar="<bytes>",
+            type=int,
+            default=None,
+            help="Number of bytes checked at the start of each file; default "
+            "is 16384",
+        )
 
         # Match clauses
         run_config_argument(
@@ -663,5 +789,35 @@ class IllegalConfiguration(Exception):
 
 # General configurations for mbl-licensing-checker run.
 RunConfiguration = namedtuple(
-    "RunConfiguration", ("explain", "debug", "verbose", "count", "config")
+    "RunConfiguration",
+    (
+        "explain",
+        "debug",
+        "verbose",
+        "count",
+        "config",
+        "jobs",
+        "header_size",
+    ),
 )
+
+
+def _is_dir(entry):
+    """Return True if the `os.DirEntry` is a directory, as `os.walk` does."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _match_extensions(match, extensions):
+    """Return `match` preceded by a check of the file name extension.
+
+    Most file names do not have one of the `extensions` matched by `match`:
+    they are rejected without running the regular expression.
+    """
+
+    def match_file(name):
+        return name.rpartition(".")[2] in extensions and match(name)
+
+    return match_file
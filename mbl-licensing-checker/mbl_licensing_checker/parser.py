@@ -3,10 +3,10 @@
 # SPDX-License-Identifier: BSD-3-Clause
 """Source code parser."""
 
+import io
 import re
-from io import StringIO
 
-from .utils import find_pattern
+from .utils import find_patterns
 
 
 ARM_COPYRIGHT_PATTERN = re.compile(
@@ -61,49 +61,78 @@ LICENSE_INFORMATION = re.compile(
     ^
     (.*)
     \b SPDX-License-Identifier: \s+
-    .+
+    (.+)
     $
     """,
     re.X,
 )
 
+# The patterns searched for in a single pass over the source code, each with
+# a keyword that a line must contain to match it
+PATTERNS = (
+    ("Copyright", ARM_COPYRIGHT_PATTERN),
+    ("Based", TPIP_PATH_PATTERN),
+    ("open-source", TPIP_URI_PATTERN),
+    ("Original", TPIP_COPYRIGHT_PATTERN),
+    ("SPDX-License-Identifier:", LICENSE_INFORMATION),
+)
+
 
 class Parser:
-    """Parse the given file-like object."""
+    """Parse the given source code."""
 
-    def __init__(self, filelike):
+    def __init__(self, source):
         """Create a source code parser."""
-        self.source = filelike.readlines()
+        self.source = source
         self.arm_copyright = None
         self.arm_copyright_tpip = None
         self.tpip_path = None
         self.tpip_source_uri = None
         self.tpip_copyright = None
         self.spdx_identifier = None
+        self.is_tpip = False
 
     # ---------------------------- Public Methods -----------------------------
 
-    def parse_filelike(self):
-        """Parse the source code."""
-        self._check_arm_copyright()
+    def parse_source(self):
+        """Parse the source code.
+
+        The lines are split from the source while it is scanned, so that the
+        lines after the header are never split when it is complete.
+        """
+        lines = io.StringIO(self.source, newline=None)
+        (
+            arm_copyright,
+            tpip_path,
+            tpip_source_uri,
+            tpip_copyright,
+            spdx_identifier,
+        ) = find_patterns(lines, PATTERNS)
 
-        self._check_tpip_path()
+        self._check_arm_copyright(arm_copyright)
 
-        self._check_tpip_source_uri()
+        self._check_tpip_path(tpip_path)
 
-        self._check_tpip_copyright()
+        self._check_tpip_source_uri(tpip_source_uri)
 
-        self._check_spdx_identifier()
+        self._check_tpip_copyright(tpip_copyright)
+
+        self._check_spdx_identifier(spdx_identifier)
+
+        self.is_tpip = bool(
+            self.tpip_path
+            or self.tpip_source_uri
+            or self.tpip_copyright
+            or self.arm_copyright_tpip
+        )
 
     # --------------------------- Private Methods -----------------------------
 
-    def _check_arm_copyright(self):
+    def _check_arm_copyright(self, match_group):
         """Check if the file contains an ARM copyright.
 
         Also check if the copyright is included in a TPIP.
         """
-        match_group = find_pattern(self.source, ARM_COPYRIGHT_PATTERN)
-
         if match_group:
             self.arm_copyright = match_group(0)
 
@@ -112,30 +141,24 @@ class Parser:
             else:
                 self.arm_copyright_tpip = None
 
-    def _check_tpip_path(self):
+    def _check_tpip_path(self, match_group):
         """Check if the file contains the path fo the original file."""
-        match_group = find_pattern(self.source, TPIP_PATH_PATTERN)
         self.tpip_path = None if not match_group else match_group(0)
 
-    def _check_tpip_source_uri(self):
+    def _check_tpip_source_uri(self, match_group):
         """Check if the file contains the URI to the original file."""
-        match_group = find_pattern(self.source, TPIP_URI_PATTERN)
         self.tpip_source_uri = None if not match_group else match_group(0)
 
-    def _check_tpip_copyright(self):
+    def _check_tpip_copyright(self, match_group):
         """Check if the file include the original copyright."""
-        match_group = find_pattern(self.source, TPIP_COPYRIGHT_PATTERN)
         self.tpip_copyright = None if not match_group else match_group(0)
 
-    def _check_spdx_identifier(self):
+    def _check_spdx_identifier(self, match_group):
         """Check if the file contains an SPDX id.
 
         The id must in a line that match expect the pattern
-        LICENSE_INFORMATION.
+        LICENSE_INFORMATION, which captures it in its second group.
         """
-        match_group = find_pattern(self.source, LICENSE_INFORMATION)
         self.spdx_identifier = (
-            None
-            if not match_group
-            else match_group(0).replace(" ", "").split(":")[1]
+            None if not match_group else match_group(2).replace(" ", "")
         )
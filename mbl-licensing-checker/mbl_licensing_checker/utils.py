@@ -20,9 +20,26 @@ def is_blank(string):
     return not string.strip()
 
 
-def find_pattern(lines, pattern):
-    """Return a match group if the pattern is found otherwise return None."""
+def find_patterns(lines, patterns):
+    """Return the match group of the first line matching each pattern.
+
+    `patterns` is a sequence of (keyword, pattern) pairs. A pattern is only
+    searched for in the lines containing its keyword, which is much cheaper
+    to look for.
+
+    All the patterns are searched for in a single pass over the lines, which
+    stops as soon as every pattern was found. The match group of a pattern
+    that is not found is None.
+    """
+    match_groups = [None] * len(patterns)
+    remaining = len(patterns)
     for line in lines:
-        match = pattern.search(line)
-        if match:
-            return match.group
+        for index, (keyword, pattern) in enumerate(patterns):
+            if match_groups[index] is None and keyword in line:
+                match = pattern.search(line)
+                if match:
+                    match_groups[index] = match.group
+                    remaining -= 1
+        if not remaining:
+            break
+    return match_groups
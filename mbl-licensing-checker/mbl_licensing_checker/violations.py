@@ -8,13 +8,10 @@
 # SPDX-License-Identifier: MIT
 """License violation definition."""
 
-from itertools import dropwhile
 from functools import partial
 from collections import namedtuple
 from typing import Iterable, Optional, List, Callable, Any
 
-from .utils import is_blank
-
 
 ErrorParams = namedtuple("ErrorParams", ["code", "short_desc", "context"])
 
@@ -25,6 +22,17 @@ class Error:
     # Options that define how errors are printed:
     explain = False
 
+    __slots__ = (
+        "code",
+        "short_desc",
+        "context",
+        "parameters",
+        "src_code",
+        "filename",
+        "explanation",
+        "_message",
+    )
+
     def __init__(
         self,
         code: str,
@@ -43,6 +51,7 @@ class Error:
         self.src_code = None  # type: Optional[str]
         self.filename = None  # type: Optional[str]
         self.explanation = None  # type: Optional[str]
+        self._message = None  # type: Optional[str]
 
     def set_context(self, filename: str, explanation: str) -> None:
         """Set the source code context for this error."""
@@ -51,19 +60,24 @@ class Error:
 
     @property
     def message(self) -> str:
-        """Return the message to print to the user."""
-        ret = "{}: {}".format(self.code, self.short_desc)
-        if self.context is not None:
-            specific_error_msg = self.context.format(*self.parameters)
-            ret += " ({})".format(specific_error_msg)
-        return ret
+        """Return the message to print to the user.
+
+        The message does not depend on the context of the error, it is only
+        formatted once.
+        """
+        if self._message is None:
+            ret = "{}: {}".format(self.code, self.short_desc)
+            if self.context is not None:
+                specific_error_msg = self.context.format(*self.parameters)
+                ret += " ({})".format(specific_error_msg)
+            self._message = ret
+        return self._message
 
     def __str__(self) -> str:
-        """Set the informal string representation of an instance."""
-        if self.explanation:
-            self.explanation = "\n".join(
-                l for l in self.explanation.split("\n") if not is_blank(l)
-            )
+        """Set the informal string representation of an instance.
+
+        The explanation is expected without blank lines.
+        """
         template = "{filename}: \n        {message}"
         if self.explain:
             template += "\n\n{explanation}\n\n"
@@ -134,23 +148,23 @@ class ErrorRegistry:
         """Output the registry as reStructuredText, for documentation."""
         sep_line = "+" + 6 * "-" + "+" + "-" * 71 + "+\n"
         blank_line = "|" + 78 * " " + "|\n"
-        table = ""
+        table = []
         for group in cls.groups:
-            table += sep_line
-            table += blank_line
-            table += "|" + "**{}**".format(group.name).center(78) + "|\n"
-            table += blank_line
+            table.append(sep_line)
+            table.append(blank_line)
+            table.append("|" + "**{}**".format(group.name).center(78) + "|\n")
+            table.append(blank_line)
             for error in group.errors:
-                table += sep_line
-                table += (
+                table.append(sep_line)
+                table.append(
                     "|"
                     + error.code.center(6)
                     + "| "
                     + error.short_desc.ljust(70)
                     + "|\n"
                 )
-        table += sep_line
-        return table
+        table.append(sep_line)
+        return "".join(table)
 
 
 D1xx = ErrorRegistry.create_group("D1", "Missing copyright notice")
@@ -186,7 +200,11 @@ class AttrDict(dict):
         return self[item]
 
 
-all_errors = set(ErrorRegistry.get_error_codes())
+# All the errors are registered by now: collect their codes once. The sets
+# are frozen as they are shared by every configuration.
+all_errors = frozenset(ErrorRegistry.get_error_codes())
 
 
-conventions = AttrDict({"reuse_v2_0": all_errors - {"D300"}, "none": set()})
+conventions = AttrDict(
+    {"reuse_v2_0": all_errors - {"D300"}, "none": frozenset()}
+)
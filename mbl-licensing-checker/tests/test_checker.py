@@ -0,0 +1,168 @@
+# Copyright (c) 2019 Arm Limited and Contributors. All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Pytest tests for the mbl-licensing-checker checker.
+
+The generic structure of every test is:
+    * Set up Mock objects
+    * Call the method under test
+    * Check the results
+"""
+
+import logging
+import os
+from unittest.mock import Mock
+
+from mbl_licensing_checker import checker
+
+ARM_COPYRIGHT = (
+    "# Copyright (c) 2019 Arm Limited and Contributors. All rights reserved."
+)
+
+
+def test__get_read_ahead_executor(monkeypatch):
+    """Test _get_read_ahead_executor() function.
+
+    Check if a single thread pool is created per process and if a new one is
+    created in a forked process.
+    """
+    # Set up Mock objects
+    monkeypatch.setattr(checker, "_read_ahead_executor", None)
+    monkeypatch.setattr(checker, "_read_ahead_pid", None)
+
+    # Call the method under test
+    first = checker._get_read_ahead_executor()
+    second = checker._get_read_ahead_executor()
+    monkeypatch.setattr(os, "getpid", Mock(return_value=-1))
+    forked = checker._get_read_ahead_executor()
+
+    # Check the results
+    assert first is second
+    assert forked is not first
+    first.shutdown()
+    forked.shutdown()
+
+
+def test__read_header(tmp_path):
+    """Test _read_header() function.
+
+    Check if only the first `header_size` bytes are read and if invalid
+    UTF-8 bytes are replaced when they are decoded.
+    """
+    # Set up Mock objects
+    filename = tmp_path / "foo.py"
+    filename.write_bytes(b"# \xff\n" + b"#" * checker.HEADER_SIZE)
+
+    # Call the method under test
+    digest, source = checker._read_header(str(filename), checker.HEADER_SIZE)
+
+    # Check the results
+    assert len(digest) == 16
+    assert source.startswith("# \ufffd\n")
+    assert len(source) == checker.HEADER_SIZE
+
+
+def test_check_header_size(tmp_path):
+    """Test check() function with a notice past the header.
+
+    Check if a copyright notice after the first `header_size` bytes is not
+    found.
+    """
+    # Set up Mock objects
+    filename = tmp_path / "foo.py"
+    filename.write_text("#\n" * checker.HEADER_SIZE + ARM_COPYRIGHT + "\n")
+
+    # Call the method under test
+    default_errors = list(checker.check([str(filename)], select=["D100"]))
+    raised_errors = list(
+        checker.check(
+            [str(filename)],
+            select=["D100"],
+            header_size=4 * checker.HEADER_SIZE,
+        )
+    )
+
+    # Check the results
+    assert [error.code for error in default_errors] == ["D100"]
+    assert raised_errors == []
+
+
+def test_check_unreadable(tmp_path, caplog):
+    """Test check() function with a file that cannot be read.
+
+    Check if the file is skipped with a warning and the other files are
+    still checked.
+    """
+    # Set up Mock objects
+    missing = str(tmp_path / "missing.py")
+    os.symlink(str(tmp_path / "nowhere.py"), missing)
+    filename = tmp_path / "foo.py"
+    filename.write_text("# No notice\n")
+
+    # Call the method under test
+    with caplog.at_level(logging.WARNING, logger=checker.log.name):
+        errors = list(checker.check([missing, str(filename)], select=["D100"]))
+
+    # Check the results
+    assert [(error.filename, error.code) for error in errors] == [
+        (str(filename), "D100")
+    ]
+    assert [record.getMessage() for record in caplog.records] == [
+        "Error in file {0}: [Errno 2] No such file or directory: '{0}'".format(
+            missing
+        )
+    ]
+
+
+def test_check_duplicate_headers(monkeypatch, tmp_path):
+    """Test check() function with files with the same header.
+
+    Check if a header is checked once per file extension kind, and if its
+    errors are reported for each file that has it.
+    """
+    # Set up Mock objects
+    mock_check_source = Mock(wraps=checker.check_source)
+    monkeypatch.setattr(checker, "check_source", mock_check_source)
+    filenames = [str(tmp_path / name) for name in ("a.py", "b.py", "c.bb")]
+    for filename in filenames:
+        with open(filename, "w") as f:
+            f.write("# SPDX-License-Identifier: BSD-3-Clause\n")
+
+    # Call the method under test
+    errors = list(checker.check(filenames, select=["D300", "D302"]))
+
+    # Check the results
+    assert [call[0][1] for call in mock_check_source.call_args_list] == [
+        filenames[0],
+        filenames[2],
+    ]
+    assert [(error.filename, error.code) for error in errors] == [
+        (filenames[0], "D300"),
+        (filenames[1], "D300"),
+        (filenames[2], "D302"),
+    ]
+
+
+def test_check_source_tpip_only():
+    """Test ConventionChecker.check_source() method with TPIP only checks.
+
+    Check if the checks for TPIP are skipped for a file without TPIP and run
+    for a file with TPIP.
+    """
+    # Set up Mock objects
+    codes = frozenset({"D101", "D102", "D103"})
+    # Split so that this file is not seen as containing TPIP itself
+    tpip_source = "# Based " + "on: src/foo.py\n" + ARM_COPYRIGHT + "\n"
+
+    # Call the method under test
+    arm_errors = list(
+        checker._checker.check_source(ARM_COPYRIGHT + "\n", "foo.py", codes)
+    )
+    tpip_errors = list(
+        checker._checker.check_source(tpip_source, "foo.py", codes)
+    )
+
+    # Check the results
+    assert arm_errors == []
+    assert [error.code for error in tpip_errors] == ["D102", "D103"]
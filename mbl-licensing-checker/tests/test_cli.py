@@ -0,0 +1,275 @@
+# Copyright (c) 2019 Arm Limited and Contributors. All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Pytest tests for the mbl-licensing-checker command line interface.
+
+The generic structure of every test is:
+    * Set up Mock objects
+    * Call the method under test
+    * Check the results
+"""
+
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+from mbl_licensing_checker import cli
+from mbl_licensing_checker.config import (
+    ConfigurationParser,
+    IllegalConfiguration,
+)
+from mbl_licensing_checker.utils import log
+
+ARM_COPYRIGHT = (
+    "# Copyright (c) 2019 Arm Limited and Contributors. All rights reserved."
+)
+
+
+@pytest.fixture
+def restore_log():
+    """Restore the handlers and the level of the logger after a test."""
+    handlers, level = log.handlers, log.level
+    yield
+    log.handlers = handlers
+    log.setLevel(level)
+
+
+class SerialExecutor:
+    """Executor running each submitted call at once, recording its batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def submit(self, func, batch):
+        self.batches.append(batch)
+        future = Future()
+        future.set_result(func(batch))
+        return future
+
+
+def test__check_batch():
+    """Test _check_batch() function.
+
+    Check if the list of errors found in each header is returned, in the
+    batch order.
+    """
+    # Set up Mock objects
+    codes = frozenset({"D100", "D200"})
+    batch = [
+        (ARM_COPYRIGHT + "\n", "foo.py", codes),
+        ("# SPDX-License-Identifier: Apache-2.0\n", "bar.py", codes),
+    ]
+
+    # Call the method under test
+    errors = cli._check_batch(batch)
+
+    # Check the results
+    assert [
+        [error.code for error in file_errors] for file_errors in errors
+    ] == [
+        ["D200"],
+        ["D100"],
+    ]
+    assert errors[1][0].filename == "bar.py"
+
+
+def test__check_files(tmp_path):
+    """Test _check_files() function with files with the same header.
+
+    Check if a header shared by several files is only checked once, with
+    its errors reported for each of them, and if files with another
+    extension checked for the same codes do not share the errors.
+    """
+    # Set up Mock objects
+    codes = frozenset({"D100", "D300", "D302"})
+    filenames = [str(tmp_path / name) for name in ("a.py", "b.py", "c.bb")]
+    for filename in filenames:
+        with open(filename, "w") as f:
+            f.write("# SPDX-License-Identifier: BSD-3-Clause\n")
+    executor = SerialExecutor()
+
+    # Call the method under test
+    errors = list(
+        cli._check_files(
+            executor,
+            ((filename, codes) for filename in filenames),
+            cli.HEADER_SIZE,
+            max_pending=1,
+        )
+    )
+
+    # Check the results
+    checked_filenames = [
+        filename for batch in executor.batches for _, filename, _ in batch
+    ]
+    assert checked_filenames == [filenames[0], filenames[2]]
+    assert [
+        [(error.filename, error.code) for error in file_errors]
+        for file_errors in errors
+    ] == [
+        [(filenames[0], "D100"), (filenames[0], "D300")],
+        [(filenames[1], "D100"), (filenames[1], "D300")],
+        [(filenames[2], "D100"), (filenames[2], "D302")],
+    ]
+
+
+def test__check_files_pending(tmp_path):
+    """Test _check_files() function with more files than batches pending.
+
+    Check if at most `max_pending` batches of files are checked ahead of the
+    file whose errors are reported, and if the errors are reported in the
+    files order.
+    """
+    # Set up Mock objects
+    codes = frozenset({"D100"})
+    filenames = []
+    for index in range(6):
+        filename = str(tmp_path / "file_{}.py".format(index))
+        with open(filename, "w") as f:
+            f.write("# File {}\n".format(index))
+        filenames.append(filename)
+    executor = SerialExecutor()
+
+    # Call the method under test
+    errors = cli._check_files(
+        executor,
+        ((filename, codes) for filename in filenames),
+        cli.HEADER_SIZE,
+        max_pending=1,
+        batch_size=2,
+    )
+    first_errors = next(errors)
+    submitted = len(executor.batches)
+    other_errors = list(errors)
+
+    # Check the results
+    assert submitted == 1
+    assert len(executor.batches) == 3
+    assert [first_errors[0].filename] + [
+        file_errors[0].filename for file_errors in other_errors
+    ] == filenames
+
+
+def test_run_mbl_licensing_checker_jobs(
+    monkeypatch, capsys, tmp_path, restore_log
+):
+    """Test run_mbl_licensing_checker() function with several processes.
+
+    Check if the errors found by the worker processes are reported in the
+    order the files were found in the directory, with the matching return
+    code.
+    """
+    # Set up Mock objects
+    for index in range(40):
+        notice = ARM_COPYRIGHT if index % 2 else "# No notice"
+        (tmp_path / "file_{:02}.py".format(index)).write_text(
+            notice + "\n# SPDX-License-Identifier: Apache-2.0\n"
+        )
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["mbl-licensing-checker", "-j", "2", "--convention", "none"]
+        + ["--add-select", "D100", str(tmp_path)],
+    )
+
+    # Call the method under test
+    return_code = cli.run_mbl_licensing_checker()
+
+    # Check the results
+    assert return_code == cli.ReturnCode.VIOLATIONS_FOUND.value
+    expected = "".join(
+        "{}: \n        D100: Missing ARM copyright notice\n".format(
+            tmp_path / filename
+        )
+        for filename in os.listdir(str(tmp_path))
+        if int(filename[5:7]) % 2 == 0
+    )
+    assert capsys.readouterr().out == expected
+
+
+def test_run_mbl_licensing_checker_header_size(
+    monkeypatch, capsys, tmp_path, restore_log
+):
+    """Test run_mbl_licensing_checker() function with --header-size.
+
+    Check if a copyright notice past the default header size is only found
+    when the header size is raised.
+    """
+    # Set up Mock objects
+    filename = tmp_path / "late_notice.py"
+    filename.write_text(
+        "#\n" * cli.HEADER_SIZE
+        + ARM_COPYRIGHT
+        + "\n# SPDX-License-Identifier: Apache-2.0\n"
+    )
+    argv = ["mbl-licensing-checker", "--convention", "none"]
+    argv += ["--add-select", "D100", str(tmp_path)]
+
+    # Call the method under test
+    monkeypatch.setattr(sys, "argv", argv)
+    default_return_code = cli.run_mbl_licensing_checker()
+    default_out = capsys.readouterr().out
+    monkeypatch.setattr(
+        sys, "argv", argv[:1] + ["--header-size", "65536"] + argv[1:]
+    )
+    raised_return_code = cli.run_mbl_licensing_checker()
+    raised_out = capsys.readouterr().out
+
+    # Check the results
+    assert default_return_code == cli.ReturnCode.VIOLATIONS_FOUND.value
+    expected = "{}: \n        D100: Missing ARM copyright notice\n"
+    assert default_out == expected.format(filename)
+    assert raised_return_code == cli.ReturnCode.NO_VIOLATIONS_FOUND.value
+    assert raised_out == ""
+
+
+def test_run_mbl_licensing_checker_invalid_files(
+    monkeypatch, capsys, tmp_path, restore_log
+):
+    """Test run_mbl_licensing_checker() function with an invalid directory.
+
+    Check if the invalid options return code is returned when the
+    configuration of a directory is found to be invalid while its files are
+    checked.
+    """
+    # Set up Mock objects
+    filename = str(tmp_path / "foo.py")
+    with open(filename, "w") as f:
+        f.write("# No notice\n")
+
+    def get_files_to_check(self):
+        yield filename, frozenset({"D100"})
+        raise IllegalConfiguration("Invalid configuration")
+
+    monkeypatch.setattr(
+        ConfigurationParser, "get_files_to_check", get_files_to_check
+    )
+    monkeypatch.setattr(sys, "argv", ["mbl-licensing-checker"])
+
+    # Call the method under test
+    return_code = cli.run_mbl_licensing_checker()
+
+    # Check the results
+    assert return_code == cli.ReturnCode.INVALID_OPTIONS.value
+    assert "ERROR: Invalid configuration" in capsys.readouterr().err
+
+
+def test_run_mbl_licensing_checker_invalid_jobs(
+    monkeypatch, capsys, restore_log
+):
+    """Test run_mbl_licensing_checker() function with an invalid -j value.
+
+    Check if the invalid options return code is returned.
+    """
+    # Set up Mock objects
+    monkeypatch.setattr(sys, "argv", ["mbl-licensing-checker", "-j", "0"])
+
+    # Call the method under test
+    return_code = cli.run_mbl_licensing_checker()
+
+    # Check the results
+    assert return_code == cli.ReturnCode.INVALID_OPTIONS.value
+    assert "Illegal number of jobs '0'" in capsys.readouterr().err
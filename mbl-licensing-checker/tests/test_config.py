@@ -0,0 +1,141 @@
+# Copyright (c) 2019 Arm Limited and Contributors. All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Pytest tests for the mbl-licensing-checker configuration parser.
+
+The generic structure of every test is:
+    * Set up Mock objects
+    * Call the method under test
+    * Check the results
+"""
+
+import argparse
+import os
+import sys
+
+import pytest
+
+from mbl_licensing_checker.config import (
+    ConfigurationParser,
+    IllegalConfiguration,
+)
+
+
+@pytest.mark.parametrize(
+    "jobs, valid",
+    [(None, True), (1, True), (8, True), (0, False), (-1, False)],
+)
+def test__validate_jobs(jobs, valid):
+    """Test _validate_jobs() method.
+
+    Check if only a missing or positive number of jobs is valid.
+    """
+    # Set up Mock objects
+    arguments = argparse.Namespace(jobs=jobs)
+
+    # Call the method under test
+    result = ConfigurationParser._validate_jobs(arguments)
+
+    # Check the results
+    assert result is valid
+
+
+@pytest.mark.parametrize(
+    "header_size, valid",
+    [(None, True), (1, True), (65536, True), (0, False), (-1, False)],
+)
+def test__validate_header_size(header_size, valid):
+    """Test _validate_header_size() method.
+
+    Check if only a missing or positive header size is valid.
+    """
+    # Set up Mock objects
+    arguments = argparse.Namespace(header_size=header_size)
+
+    # Call the method under test
+    result = ConfigurationParser._validate_header_size(arguments)
+
+    # Check the results
+    assert result is valid
+
+
+def test__parse_args_jobs():
+    """Test the -j/--jobs argument parsing.
+
+    Check if the number of jobs is parsed as an integer, and defaults to
+    None so that the process pool uses one process per CPU.
+    """
+    # Set up Mock objects
+    conf = ConfigurationParser()
+
+    # Call the method under test
+    default_arguments = conf._parse_args([])
+    short_arguments = conf._parse_args(["-j", "3"])
+    long_arguments = conf._parse_args(["--jobs", "4"])
+
+    # Check the results
+    assert default_arguments.jobs is None
+    assert short_arguments.jobs == 3
+    assert long_arguments.jobs == 4
+
+
+def test__expand_error_codes():
+    """Test _expand_error_codes() method.
+
+    Check if error code prefixes are expanded to all the codes they start,
+    ignoring blank parts.
+    """
+    # Call the method under test
+    expanded_codes = ConfigurationParser._expand_error_codes(
+        ["D10", " D300", ""]
+    )
+
+    # Check the results
+    assert expanded_codes == frozenset(
+        {"D100", "D101", "D102", "D103", "D300"}
+    )
+
+
+def test__expand_error_codes_invalid():
+    """Test _expand_error_codes() method with codes which are not iterable.
+
+    Check if an IllegalConfiguration exception is raised.
+    """
+    # Call the method under test
+    with pytest.raises(IllegalConfiguration):
+        ConfigurationParser._expand_error_codes(None)
+
+
+def test_get_files_to_check_order(monkeypatch, tmp_path):
+    """Test get_files_to_check() method on a directory tree.
+
+    Check if the files are found in the same order as `os.walk` walks the
+    tree, without the hidden and symbolic link directories.
+    """
+    # Set up Mock objects
+    for dirpath in ("b", "a/d", "a/c", "e", ".hidden"):
+        os.makedirs(str(tmp_path / dirpath))
+        for name in ("z.py", "y.sh", "x.txt"):
+            (tmp_path / dirpath / name).write_text("")
+    (tmp_path / "top.py").write_text("")
+    os.symlink(str(tmp_path / "b"), str(tmp_path / "link"))
+    top = str(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["mbl-licensing-checker", top])
+    conf = ConfigurationParser()
+    conf.parse()
+
+    # Call the method under test
+    files_to_check = list(conf.get_files_to_check())
+
+    # Check the results
+    expected = []
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        expected.extend(
+            os.path.join(dirpath, name)
+            for name in filenames
+            if not name.endswith(".txt")
+        )
+    assert len(expected) == 9
+    assert [filename for filename, _ in files_to_check] == expected